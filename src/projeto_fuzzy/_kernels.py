@@ -0,0 +1,158 @@
+"""
+Kernels escalares do sistema de inferência, compilados com numba quando
+disponível.
+
+As funções de pertinência são aritmética pura (sem dicionários nem objetos do
+scikit-fuzzy) e o kernel das 47 regras é *gerado* em tempo de import a partir
+de ``fuzzy_system._TABELA_REGRAS``: ``build_kernel`` emite uma função Python
+em linha reta especializada para a tabela, compila com ``exec`` e aplica
+``numba.njit``. Sem numba instalado as mesmas funções rodam como Python puro.
+"""
+
+try:
+    from numba import njit
+    _TEM_NUMBA = True
+except ImportError:  # numba é dependência opcional (extra "speed")
+    _TEM_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def decorador(func):
+            return func
+        if args and callable(args[0]):
+            return args[0]
+        return decorador
+
+
+@njit(cache=True, fastmath=True)
+def trimf_scalar(x, a, b, c):
+    """Pertinência triangular de ``x`` em (a, b, c), equivalente a fuzz.trimf."""
+    if x < a or x > c:
+        return 0.0
+    if x < b:
+        return (x - a) / (b - a)
+    if x == b:
+        return 1.0
+    return (c - x) / (c - b)
+
+
+@njit(cache=True, fastmath=True)
+def trapmf_scalar(x, a, b, c, d):
+    """Pertinência trapezoidal de ``x`` em (a, b, c, d), equivalente a fuzz.trapmf."""
+    if x < a or x > d:
+        return 0.0
+    if x < b:
+        return (x - a) / (b - a)
+    if x <= c:
+        return 1.0
+    return (d - x) / (d - c)
+
+
+# Limites dos universos por argumento de entrada: entradas fora da grade
+# saturam na borda, como fazem o np.interp e a LUT nos outros caminhos
+UNIVERSO_LIMITES = {
+    'at': (-15.0, 15.0),
+    'dh': (0.0, 300.0),
+    'nd': (-0.4, 0.4),
+}
+
+# Parâmetros das MFs por termo, em linha com _definir_funcoes_pertinencia.
+# A chave externa é o nome do argumento de entrada do kernel.
+MF_PARAMS = {
+    'at': {
+        'frio_prejudicial': ('trapmf_scalar', (-15.0, -15.0, -10.0, -5.0)),
+        'ideal':            ('trimf_scalar', (-7.0, 0.0, 7.0)),
+        'calor_moderado':   ('trimf_scalar', (1.0, 2.0, 3.0)),
+        'calor_extremo':    ('trapmf_scalar', (11.0, 14.0, 15.0, 15.0)),
+    },
+    'dh': {
+        'ideal_ou_excesso': ('trapmf_scalar', (0.0, 0.0, 50.0, 100.0)),
+        'deficit_leve':     ('trimf_scalar', (50.0, 100.0, 150.0)),
+        'deficit_moderado': ('trimf_scalar', (100.0, 150.0, 200.0)),
+        'seca_severa':      ('trapmf_scalar', (150.0, 225.0, 300.0, 300.0)),
+    },
+    'nd': {
+        'muito_abaixo_media': ('trapmf_scalar', (-0.4, -0.4, -0.25, -0.15)),
+        'abaixo_media':       ('trimf_scalar', (-0.2, -0.1, 0.0)),
+        'na_media_ou_acima':  ('trapmf_scalar', (-0.05, 0.05, 0.4, 0.4)),
+    },
+}
+
+
+def build_kernel(tabela_regras, ordem_consequente):
+    """
+    Gera, compila e devolve o kernel escalar especializado para a tabela.
+
+    A fonte emitida é uma função em linha reta ``f(at, dh, nd, centroides,
+    risco_padrao)``: uma atribuição por grau de pertinência, um ``max`` de
+    ``min`` por termo do consequente e o center-average no final — sem
+    dicionários nem laços em tempo de execução. O resultado passa por
+    ``numba.njit`` quando disponível (sem ``cache=True``: fonte gerada por
+    ``exec`` não tem arquivo para o cache do numba).
+    """
+    linhas = ['def _kernel(at, dh, nd, centroides, risco_padrao):']
+    # Satura as entradas nos limites dos universos: sem isto os ombros das
+    # MFs analíticas devolveriam 0 logo além da grade (p.ex. seca_severa em
+    # dh=305), em vez do valor de borda dos demais caminhos
+    for arg, (minimo, maximo) in UNIVERSO_LIMITES.items():
+        linhas.append(f'    {arg} = min(max({arg}, {minimo!r}), {maximo!r})')
+    for arg, termos in MF_PARAMS.items():
+        for nome, (funcao, params) in termos.items():
+            parametros = ', '.join(repr(p) for p in params)
+            linhas.append(f'    mu_{arg}_{nome} = {funcao}({arg}, {parametros})')
+
+    def grau(arg, nome):
+        return f'mu_{arg}_{nome}'
+
+    for indice, consequente in enumerate(ordem_consequente):
+        baratos, caros = [], []
+        for nome_n, nome_d, nome_a, nome_r in tabela_regras:
+            if nome_r != consequente:
+                continue
+            graus = [grau(arg, nome) for arg, nome in
+                     (('nd', nome_n), ('dh', nome_d), ('at', nome_a)) if nome is not None]
+            disparo = graus[0] if len(graus) == 1 else 'min(%s)' % ', '.join(graus)
+            # Regras curinga/fallback (menos de 3 antecedentes) são baratas e
+            # frequentemente dominam o grupo na agregação max
+            (baratos if len(graus) < 3 else caros).append(disparo)
+        if baratos and caros:
+            # Atalho de dominância: se os fallbacks já saturaram o termo,
+            # nenhuma regra de 3 antecedentes pode melhorar o max
+            linhas.append('    w%d = max(%s)' % (indice, ', '.join(baratos))
+                          if len(baratos) > 1 else f'    w{indice} = {baratos[0]}')
+            linhas.append(f'    if w{indice} < 1.0:')
+            linhas.append(f'        w{indice} = max(w{indice}, {", ".join(caros)})')
+        else:
+            linhas.append(f'    w{indice} = max({", ".join(baratos + caros)})')
+
+    soma = ' + '.join(f'w{i}' for i in range(len(ordem_consequente)))
+    media = ' + '.join(f'w{i} * centroides[{i}]' for i in range(len(ordem_consequente)))
+    linhas += [
+        f'    soma_w = {soma}',
+        '    if soma_w == 0.0:',
+        '        return risco_padrao',
+        f'    return ({media}) / soma_w',
+    ]
+
+    espaco = {'trimf_scalar': trimf_scalar, 'trapmf_scalar': trapmf_scalar}
+    exec(compile('\n'.join(linhas), '<projeto_fuzzy._kernels.build_kernel>', 'exec'), espaco)
+    return njit(fastmath=True)(espaco['_kernel']) if _TEM_NUMBA else espaco['_kernel']
+
+
+def build_batch_kernel(kernel_escalar):
+    """
+    Versão paralela do kernel escalar para rasters: um ``prange`` sobre os
+    pontos (todos independentes, working set de poucos floats por ponto),
+    escalando de forma aproximadamente linear com os núcleos.
+
+    Devolve ``None`` sem numba — o chamador usa o caminho NumPy em blocos.
+    """
+    if not _TEM_NUMBA:
+        return None
+    from numba import prange
+
+    @njit(parallel=True, fastmath=True)
+    def _kernel_lote(at, dh, nd, centroides, risco_padrao, saida):
+        for i in prange(at.size):
+            saida[i] = kernel_escalar(at[i], dh[i], nd[i], centroides, risco_padrao)
+
+    return _kernel_lote
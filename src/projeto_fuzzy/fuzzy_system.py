@@ -1,23 +1,180 @@
+import functools
+import sys
+import threading
+
 import numpy as np
 import skfuzzy as fuzz
+from scipy import ndimage
 from skfuzzy import control as ctrl
 
+from projeto_fuzzy import _kernels
+
+# Tabela declarativa das 47 regras: (ndvi, deficit_hidrico, anomalia_termica,
+# consequente). `None` indica antecedente curinga (a regra não restringe aquela
+# variável). A mesma tabela alimenta o grafo do scikit-fuzzy e a construção
+# vetorizada da tabela de consulta (LUT).
+_TABELA_REGRAS = [
+    # Linha 1: Déficit Hídrico = ideal_ou_excesso
+    ('na_media_ou_acima', 'ideal_ou_excesso', 'frio_prejudicial', 'moderado'),
+    ('na_media_ou_acima', 'ideal_ou_excesso', 'ideal',            'baixo'),
+    ('na_media_ou_acima', 'ideal_ou_excesso', 'calor_moderado',   'baixo'),
+    ('na_media_ou_acima', 'ideal_ou_excesso', 'calor_extremo',    'moderado'),
+
+    # Linha 2: Déficit Hídrico = deficit_leve
+    ('na_media_ou_acima', 'deficit_leve', 'frio_prejudicial', 'moderado'),
+    ('na_media_ou_acima', 'deficit_leve', 'ideal',            'baixo'),
+    ('na_media_ou_acima', 'deficit_leve', 'calor_moderado',   'moderado'),
+    ('na_media_ou_acima', 'deficit_leve', 'calor_extremo',    'alto'),
+
+    # Linha 3: Déficit Hídrico = deficit_moderado
+    ('na_media_ou_acima', 'deficit_moderado', 'frio_prejudicial', 'alto'),
+    ('na_media_ou_acima', 'deficit_moderado', 'ideal',            'moderado'),
+    ('na_media_ou_acima', 'deficit_moderado', 'calor_moderado',   'alto'),
+    ('na_media_ou_acima', 'deficit_moderado', 'calor_extremo',    'critico'),
+
+    # Linha 4: Déficit Hídrico = seca_severa
+    ('na_media_ou_acima', 'seca_severa', 'frio_prejudicial', 'alto'),
+    ('na_media_ou_acima', 'seca_severa', 'ideal',            'alto'),
+    ('na_media_ou_acima', 'seca_severa', 'calor_moderado',   'critico'),
+    ('na_media_ou_acima', 'seca_severa', 'calor_extremo',    'critico'),
+
+    # NDVI abaixo da média com condições favoráveis ainda representa risco moderado
+    ('abaixo_media', 'ideal_ou_excesso', 'ideal', 'moderado'),
+    ('abaixo_media', 'deficit_leve',     'ideal', 'alto'),
+    ('abaixo_media', 'deficit_moderado', 'ideal', 'alto'),
+    ('abaixo_media', 'seca_severa',      'ideal', 'critico'),
+
+    # NDVI abaixo da média com calor
+    ('abaixo_media', 'ideal_ou_excesso', 'calor_moderado', 'alto'),
+    ('abaixo_media', 'ideal_ou_excesso', 'calor_extremo',  'alto'),
+    ('abaixo_media', 'deficit_leve',     'calor_moderado', 'alto'),
+    ('abaixo_media', 'deficit_leve',     'calor_extremo',  'critico'),
+
+    # NDVI abaixo da média com frio
+    ('abaixo_media', 'ideal_ou_excesso', 'frio_prejudicial', 'alto'),
+    ('abaixo_media', 'deficit_leve',     'frio_prejudicial', 'alto'),
+
+    # NDVI muito abaixo da média indica problemas graves independente das outras condições
+    ('muito_abaixo_media', 'ideal_ou_excesso', 'ideal', 'alto'),
+    ('muito_abaixo_media', 'deficit_leve',     'ideal', 'alto'),
+    ('muito_abaixo_media', 'deficit_moderado', 'ideal', 'critico'),
+    ('muito_abaixo_media', 'seca_severa',      'ideal', 'critico'),
+
+    # NDVI muito abaixo com calor extremo
+    ('muito_abaixo_media', 'ideal_ou_excesso', 'calor_extremo', 'critico'),
+    ('muito_abaixo_media', 'deficit_leve',     'calor_extremo', 'critico'),
+    ('muito_abaixo_media', 'deficit_moderado', 'calor_extremo', 'critico'),
+    ('muito_abaixo_media', 'seca_severa',      'calor_extremo', 'critico'),
+
+    # NDVI muito abaixo com calor moderado
+    ('muito_abaixo_media', 'ideal_ou_excesso', 'calor_moderado', 'alto'),
+    ('muito_abaixo_media', 'deficit_leve',     'calor_moderado', 'critico'),
+    ('muito_abaixo_media', 'deficit_moderado', 'calor_moderado', 'critico'),
+    ('muito_abaixo_media', 'seca_severa',      'calor_moderado', 'critico'),
+
+    # NDVI muito abaixo com frio
+    ('muito_abaixo_media', 'ideal_ou_excesso', 'frio_prejudicial', 'alto'),
+    ('muito_abaixo_media', 'deficit_leve',     'frio_prejudicial', 'alto'),
+    ('muito_abaixo_media', 'deficit_moderado', 'frio_prejudicial', 'critico'),
+    ('muito_abaixo_media', 'seca_severa',      'frio_prejudicial', 'critico'),
+
+    # Regras de fallback para cenários extremos
+    (None,                 'seca_severa',      'calor_extremo',    'critico'),
+    (None,                 'seca_severa',      'frio_prejudicial', 'alto'),
+    (None,                 'seca_severa',      None,               'alto'),
+    ('muito_abaixo_media', None,               None,               'alto'),
+    ('na_media_ou_acima',  'ideal_ou_excesso', 'ideal',            'baixo'),
+]
+
+# Valor devolvido quando nenhuma regra dispara (ponto médio do universo de risco).
+_RISCO_PADRAO = 50.0
+
+# Limiares de categorização (risco < 30 é baixo, < 60 moderado, < 90 alto)
+_LIMIARES_CATEGORIA = np.array([30.0, 60.0, 90.0])
+_CATEGORIAS = np.array(['baixo', 'moderado', 'alto', 'crítico'])
+
+
+def _centroide_lote(x, mfx):
+    """
+    Centroide de várias funções agregadas de uma vez.
+
+    Reproduz o cálculo de `skfuzzy.defuzz(..., 'centroid')` (área exata dos
+    trapézios entre amostras consecutivas), mas vetorizado sobre o último eixo
+    de ``mfx`` com forma ``(..., len(x))``.
+    """
+    y1 = mfx[..., :-1]
+    y2 = mfx[..., 1:]
+    x1 = x[:-1]
+    dx = np.diff(x)
+    soma = y1 + y2
+    area = 0.5 * dx * soma
+    momento = (2.0 / 3.0 * dx * (y2 + 0.5 * y1)) / np.fmax(soma, np.finfo(float).eps) + x1
+    area_total = area.sum(axis=-1)
+    centro = (momento * area).sum(axis=-1) / np.fmax(area_total, np.finfo(float).eps)
+    return np.where(area_total > 0, centro, _RISCO_PADRAO)
+
+
 class AgroRiskFuzzy:
     """
     Sistema de Inferência Fuzzy para avaliar risco de quebra de safra.
     """
 
+    # Tamanho padrão dos blocos do simular_batch (~3MB de buffers float32,
+    # o suficiente para os blocos ficarem residentes em cache L2/L3)
+    _TAM_BLOCO_PADRAO = 16384
+
     def __init__(self):
-        self._definir_variaveis()
-        self._definir_funcoes_pertinencia()
-        self._definir_regras()
-        self.sistema   = ctrl.ControlSystem(self.regras)
-        self.simulador = ctrl.ControlSystemSimulation(self.sistema)
+        # As variáveis, MFs, regras e o ControlSystem são imutáveis e caros de
+        # montar (~100ms); todas as instâncias compartilham a mesma construção
+        # e só o simulador (com estado) é próprio de cada uma
+        self.__dict__.update(self._prototipo().__dict__)
+        self._tls = threading.local()
+        self._scratch = None  # buffers do simular_batch, ver set_batch_size
+
+    @property
+    def simulador(self):
+        """
+        ``ControlSystemSimulation`` da thread corrente.
+
+        O simulador do scikit-fuzzy guarda estado entre ``input``/``compute``
+        e não é thread-safe; manter um por thread (apontando para o mesmo
+        ``ControlSystem`` imutável) permite pontuar em paralelo com um
+        ``ThreadPoolExecutor`` sem serializar as chamadas.
+        """
+        sim = getattr(self._tls, 'simulador', None)
+        if sim is None:
+            sim = ctrl.ControlSystemSimulation(self.sistema)
+            self._tls.simulador = sim
+        return sim
+
+    @classmethod
+    @functools.lru_cache(maxsize=1)
+    def _prototipo(cls):
+        """Constrói (uma única vez por processo) o estado compartilhado."""
+        proto = object.__new__(cls)
+        proto._definir_variaveis()
+        proto._definir_funcoes_pertinencia()
+        proto._definir_regras()
+        proto.sistema = ctrl.ControlSystem(proto.regras)
+        proto._lut = None  # tabela 3D de risco, construída sob demanda
+        # Chaves internadas do simulador: a comparação no __setitem__ do
+        # input vira comparação de identidade em vez de hash de string
+        proto._k_at = sys.intern('anomalia_termica')
+        proto._k_dh = sys.intern('deficit_hidrico')
+        proto._k_nd = sys.intern('anomalia_ndvi')
+        proto._k_rq = sys.intern('risco_quebra_safra')
+        proto._kernel = _kernels.build_kernel(
+            _TABELA_REGRAS, tuple(proto.risco_quebra_safra.terms))
+        proto._kernel_lote = _kernels.build_batch_kernel(proto._kernel)
+        return proto
 
     def _definir_variaveis(self):
         self.anomalia_termica   = ctrl.Antecedent(np.arange(-15, 16, 1), 'anomalia_termica')
         self.deficit_hidrico    = ctrl.Antecedent(np.arange(0, 301, 1),    'deficit_hidrico')
-        self.anomalia_ndvi      = ctrl.Antecedent(np.arange(-0.4, 0.41, 0.01), 'anomalia_ndvi')
+        # linspace em vez de arange: o passo 0.01 acumula erro de ponto
+        # flutuante e o último ponto estoura 0.4, derrubando o platô da MF
+        # na_media_ou_acima na borda e desalinhando a indexação da LUT
+        self.anomalia_ndvi      = ctrl.Antecedent(np.linspace(-0.4, 0.4, 81), 'anomalia_ndvi')
         self.risco_quebra_safra = ctrl.Consequent(np.arange(0, 101, 1),     'risco_quebra_safra')
 
     def _definir_funcoes_pertinencia(self):
@@ -44,6 +201,40 @@ class AgroRiskFuzzy:
         self.risco_quebra_safra['alto']     = fuzz.trimf(rq, [60, 77.5, 95])
         self.risco_quebra_safra['critico']  = fuzz.trapmf(rq, [90, 97.5, 100, 100])
 
+        # Referências diretas (universo, {termo: vetor de MF}) para o caminho
+        # rápido, sem passar pelo interp_membership do scikit-fuzzy
+        self._mf_at = (at, {nome: self.anomalia_termica[nome].mf for nome in self.anomalia_termica.terms})
+        self._mf_dh = (dh, {nome: self.deficit_hidrico[nome].mf for nome in self.deficit_hidrico.terms})
+        self._mf_nd = (an, {nome: self.anomalia_ndvi[nome].mf for nome in self.anomalia_ndvi.terms})
+        self._mf_rq = (rq, {nome: self.risco_quebra_safra[nome].mf for nome in self.risco_quebra_safra.terms})
+
+        # Layout SoA: todas as MFs de uma variável empilhadas numa única
+        # matriz (termos x pontos), contígua em memória, com uma linha extra
+        # de 1.0 como alvo dos índices -1 (curinga). Junto fica (x0, passo) da
+        # grade uniforme, para fuzzificar por índice em vez de busca binária.
+        # float32: metade do tráfego de memória e o dobro de lanes SIMD no
+        # lote, com erro (<1e-5) muito abaixo do que o modelo resolve.
+        def _empilhar(universo, mfs):
+            matriz = np.vstack(list(mfs.values()) + [np.ones(universo.size)]).astype(np.float32)
+            return matriz, (float(universo[0]), float(universo[1] - universo[0]))
+
+        self._mf_at_matriz, self._grade_at = _empilhar(at, self._mf_at[1])
+        self._mf_dh_matriz, self._grade_dh = _empilhar(dh, self._mf_dh[1])
+        self._mf_nd_matriz, self._grade_nd = _empilhar(an, self._mf_nd[1])
+
+        # Centroides dos termos do consequente, calculados uma única vez: a
+        # defuzzificação do caminho rápido vira a média ponderada pelos
+        # disparos (center-average) em vez de integrar o agregado a cada chamada
+        self._centroides = {
+            nome: fuzz.defuzz(rq, mf, 'centroid') for nome, mf in self._mf_rq[1].items()
+        }
+        # Vetor (baixo, moderado, alto, critico) na ordem esperada pelo kernel,
+        # com cópia float32 para o caminho em lote
+        self._centroides_arr = np.array([
+            self._centroides[nome] for nome in ('baixo', 'moderado', 'alto', 'critico')
+        ])
+        self._centroides_arr_f32 = self._centroides_arr.astype(np.float32)
+
     def _definir_regras(self):
         A, D, N, R = (
             self.anomalia_termica,
@@ -52,110 +243,250 @@ class AgroRiskFuzzy:
             self.risco_quebra_safra
         )
 
-        # Linha 1: Déficit Hídrico = ideal_ou_excesso
-        regra_1 = ctrl.Rule(N['na_media_ou_acima'] & D['ideal_ou_excesso'] & A['frio_prejudicial'], R['moderado'])
-        regra_2 = ctrl.Rule(N['na_media_ou_acima'] & D['ideal_ou_excesso'] & A['ideal'],             R['baixo'])
-        regra_3 = ctrl.Rule(N['na_media_ou_acima'] & D['ideal_ou_excesso'] & A['calor_moderado'],   R['baixo'])
-        regra_4 = ctrl.Rule(N['na_media_ou_acima'] & D['ideal_ou_excesso'] & A['calor_extremo'],    R['moderado'])
-
-        # Linha 2: Déficit Hídrico = deficit_leve
-        regra_5 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_leve'] & A['frio_prejudicial'], R['moderado'])
-        regra_6 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_leve'] & A['ideal'],             R['baixo'])
-        regra_7 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_leve'] & A['calor_moderado'],   R['moderado'])
-        regra_8 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_leve'] & A['calor_extremo'],    R['alto'])
-
-        # Linha 3: Déficit Hídrico = deficit_moderado
-        regra_9 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_moderado'] & A['frio_prejudicial'], R['alto'])
-        regra_10 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_moderado'] & A['ideal'],             R['moderado'])
-        regra_11 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_moderado'] & A['calor_moderado'],   R['alto'])
-        regra_12 = ctrl.Rule(N['na_media_ou_acima'] & D['deficit_moderado'] & A['calor_extremo'],    R['critico'])
-        
-        # Linha 4: Déficit Hídrico = seca_severa
-        regra_13 = ctrl.Rule(N['na_media_ou_acima'] & D['seca_severa'] & A['frio_prejudicial'], R['alto'])
-        regra_14 = ctrl.Rule(N['na_media_ou_acima'] & D['seca_severa'] & A['ideal'],             R['alto'])
-        regra_15 = ctrl.Rule(N['na_media_ou_acima'] & D['seca_severa'] & A['calor_moderado'],   R['critico'])
-        regra_16 = ctrl.Rule(N['na_media_ou_acima'] & D['seca_severa'] & A['calor_extremo'],    R['critico'])
-
-        # NDVI abaixo da média com condições favoráveis ainda representa risco moderado
-        regra_17 = ctrl.Rule(N['abaixo_media'] & D['ideal_ou_excesso'] & A['ideal'], R['moderado'])
-        regra_18 = ctrl.Rule(N['abaixo_media'] & D['deficit_leve'] & A['ideal'], R['alto'])
-        regra_19 = ctrl.Rule(N['abaixo_media'] & D['deficit_moderado'] & A['ideal'], R['alto'])
-        regra_20 = ctrl.Rule(N['abaixo_media'] & D['seca_severa'] & A['ideal'], R['critico'])
-        
-        # NDVI abaixo da média com calor
-        regra_21 = ctrl.Rule(N['abaixo_media'] & D['ideal_ou_excesso'] & A['calor_moderado'], R['alto'])
-        regra_22 = ctrl.Rule(N['abaixo_media'] & D['ideal_ou_excesso'] & A['calor_extremo'], R['alto'])
-        regra_23 = ctrl.Rule(N['abaixo_media'] & D['deficit_leve'] & A['calor_moderado'], R['alto'])
-        regra_24 = ctrl.Rule(N['abaixo_media'] & D['deficit_leve'] & A['calor_extremo'], R['critico'])
-        
-        # NDVI abaixo da média com frio
-        regra_25 = ctrl.Rule(N['abaixo_media'] & D['ideal_ou_excesso'] & A['frio_prejudicial'], R['alto'])
-        regra_26 = ctrl.Rule(N['abaixo_media'] & D['deficit_leve'] & A['frio_prejudicial'], R['alto'])
-
-        # NDVI muito abaixo da média indica problemas graves independente das outras condições
-        regra_27 = ctrl.Rule(N['muito_abaixo_media'] & D['ideal_ou_excesso'] & A['ideal'], R['alto'])
-        regra_28 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_leve'] & A['ideal'], R['alto'])
-        regra_29 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_moderado'] & A['ideal'], R['critico'])
-        regra_30 = ctrl.Rule(N['muito_abaixo_media'] & D['seca_severa'] & A['ideal'], R['critico'])
-        
-        # NDVI muito abaixo com calor extremo
-        regra_31 = ctrl.Rule(N['muito_abaixo_media'] & D['ideal_ou_excesso'] & A['calor_extremo'], R['critico'])
-        regra_32 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_leve'] & A['calor_extremo'], R['critico'])
-        regra_33 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_moderado'] & A['calor_extremo'], R['critico'])
-        regra_34 = ctrl.Rule(N['muito_abaixo_media'] & D['seca_severa'] & A['calor_extremo'], R['critico'])
-        
-        # NDVI muito abaixo com calor moderado
-        regra_35 = ctrl.Rule(N['muito_abaixo_media'] & D['ideal_ou_excesso'] & A['calor_moderado'], R['alto'])
-        regra_36 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_leve'] & A['calor_moderado'], R['critico'])
-        regra_37 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_moderado'] & A['calor_moderado'], R['critico'])
-        regra_38 = ctrl.Rule(N['muito_abaixo_media'] & D['seca_severa'] & A['calor_moderado'], R['critico'])
-        
-        # NDVI muito abaixo com frio
-        regra_39 = ctrl.Rule(N['muito_abaixo_media'] & D['ideal_ou_excesso'] & A['frio_prejudicial'], R['alto'])
-        regra_40 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_leve'] & A['frio_prejudicial'], R['alto'])
-        regra_41 = ctrl.Rule(N['muito_abaixo_media'] & D['deficit_moderado'] & A['frio_prejudicial'], R['critico'])
-        regra_42 = ctrl.Rule(N['muito_abaixo_media'] & D['seca_severa'] & A['frio_prejudicial'], R['critico'])
-
-        # Regra de fallback para cenários extremos
-        regra_43 = ctrl.Rule(A['calor_extremo'] & D['seca_severa'], R['critico'])
-        regra_44 = ctrl.Rule(A['frio_prejudicial'] & D['seca_severa'], R['alto'])
-        regra_45 = ctrl.Rule(D['seca_severa'], R['alto'])
-        regra_46 = ctrl.Rule(N['muito_abaixo_media'], R['alto'])
-        regra_47 = ctrl.Rule(A['ideal'] & D['ideal_ou_excesso'] & N['na_media_ou_acima'], R['baixo'])
-
-        # Compilar todas as regras
-        self.regras = [
-            regra_1, regra_2, regra_3, regra_4,
-            regra_5, regra_6, regra_7, regra_8,
-            regra_9, regra_10, regra_11, regra_12,
-            regra_13, regra_14, regra_15, regra_16,
-            regra_17, regra_18, regra_19, regra_20,
-            regra_21, regra_22, regra_23, regra_24,
-            regra_25, regra_26,
-            regra_27, regra_28, regra_29, regra_30,
-            regra_31, regra_32, regra_33, regra_34,
-            regra_35, regra_36, regra_37, regra_38,
-            regra_39, regra_40, regra_41, regra_42,
-            regra_43, regra_44, regra_45, regra_46, regra_47
-        ]
-
-    def simular(self, anomalia_temp: float, deficit_hid: float, anomalia_ndvi: float) -> float:
-        self.simulador.input['anomalia_termica'] = anomalia_temp
-        self.simulador.input['deficit_hidrico']  = deficit_hid
-        self.simulador.input['anomalia_ndvi']    = anomalia_ndvi
-        self.simulador.compute()
-        return float(self.simulador.output['risco_quebra_safra'])
-
-    def categorizar(self, risco: float) -> str:
-
-        if risco < 30:
-            return "baixo"
-        elif risco < 60:
-            return "moderado"
-        elif risco < 90:
-            return "alto"
-        else:
-            return "crítico"
+        self.regras = []
+        for nome_n, nome_d, nome_a, nome_r in _TABELA_REGRAS:
+            termos = [var[nome] for var, nome in ((N, nome_n), (D, nome_d), (A, nome_a))
+                      if nome is not None]
+            antecedente = termos[0]
+            for termo in termos[1:]:
+                antecedente = antecedente & termo
+            self.regras.append(ctrl.Rule(antecedente, R[nome_r]))
+
+        # Codificação SoA da tabela: um vetor de índices int8 por variável.
+        # Curingas apontam para a linha extra de 1.0 anexada às matrizes de
+        # pertinência (índice len(termos)). As regras ficam ordenadas por
+        # termo do consequente para agregar com um único np.maximum.reduceat.
+        idx_n = {nome: i for i, nome in enumerate(N.terms)}
+        idx_d = {nome: i for i, nome in enumerate(D.terms)}
+        idx_a = {nome: i for i, nome in enumerate(A.terms)}
+        idx_r = {nome: i for i, nome in enumerate(R.terms)}
+        ordenadas = sorted(_TABELA_REGRAS, key=lambda regra: idx_r[regra[3]])
+        codifica = lambda idx, nome: len(idx) if nome is None else idx[nome]
+        self._regra_n_idx = np.array([codifica(idx_n, r[0]) for r in ordenadas], dtype=np.int8)
+        self._regra_d_idx = np.array([codifica(idx_d, r[1]) for r in ordenadas], dtype=np.int8)
+        self._regra_a_idx = np.array([codifica(idx_a, r[2]) for r in ordenadas], dtype=np.int8)
+        self._regra_cons_idx = np.array([idx_r[r[3]] for r in ordenadas], dtype=np.int8)
+        self._regra_grupos = np.searchsorted(self._regra_cons_idx, np.arange(len(idx_r)))
+
+    def _construir_lut(self):
+        """
+        Preenche ``self._lut`` avaliando o sistema Mamdani em toda a grade
+        (31 x 301 x 81) de uma só vez.
+
+        Nos pontos da grade os graus de pertinência são os próprios vetores de
+        MF, então a força de disparo de cada regra sai por broadcasting, sem
+        passar pelo ``ControlSystemSimulation``.
+        """
+        mu_n = {nome: self.anomalia_ndvi[nome].mf[None, None, :] for nome in self.anomalia_ndvi.terms}
+        mu_d = {nome: self.deficit_hidrico[nome].mf[None, :, None] for nome in self.deficit_hidrico.terms}
+        mu_a = {nome: self.anomalia_termica[nome].mf[:, None, None] for nome in self.anomalia_termica.terms}
+        forma = (
+            self.anomalia_termica.universe.size,
+            self.deficit_hidrico.universe.size,
+            self.anomalia_ndvi.universe.size,
+        )
+
+        # Agregação max das forças de disparo por termo do consequente
+        ativacao = {nome: np.zeros(forma) for nome in self.risco_quebra_safra.terms}
+        for nome_n, nome_d, nome_a, nome_r in _TABELA_REGRAS:
+            graus = [mu[nome] for mu, nome in ((mu_n, nome_n), (mu_d, nome_d), (mu_a, nome_a))
+                     if nome is not None]
+            w = graus[0]
+            for grau in graus[1:]:
+                w = np.minimum(w, grau)
+            w = np.broadcast_to(w, forma)
+            np.maximum(ativacao[nome_r], w, out=ativacao[nome_r])
+
+        # Implicação min + agregação max + centroide, em blocos ao longo do
+        # eixo da anomalia térmica para limitar o pico de memória
+        rq = self.risco_quebra_safra.universe
+        mf_cons = {nome: self.risco_quebra_safra[nome].mf for nome in self.risco_quebra_safra.terms}
+        lut = np.empty(forma, dtype=np.float32)
+        for i in range(forma[0]):
+            agregado = np.maximum.reduce([
+                np.minimum(ativacao[nome][i][..., None], mf_cons[nome])
+                for nome in mf_cons
+            ])
+            lut[i] = _centroide_lote(rq, agregado)
+
+        # Células onde nenhuma regra dispara (lacuna de cobertura da base,
+        # p.ex. at entre 7 e 11 com déficit baixo) recebem o valor da célula
+        # disparada mais próxima: deixá-las no risco padrão faria a
+        # interpolação trilinear sangrar a sentinela para entradas vizinhas
+        # bem definidas
+        mortas = np.maximum.reduce(list(ativacao.values())) <= 1e-12
+        if mortas.any():
+            indices = ndimage.distance_transform_edt(
+                mortas, return_distances=False, return_indices=True)
+            lut = lut[tuple(indices)]
+        self._lut = lut
+
+    def _obter_lut(self):
+        """LUT compartilhada entre instâncias, construída na primeira consulta."""
+        proto = self._prototipo()
+        if proto._lut is None:
+            proto._construir_lut()
+        return proto._lut
+
+    @staticmethod
+    def _interpolar_matriz(x, matriz, grade):
+        """Interpola todas as linhas da matriz de MFs nos pontos ``x`` de uma vez."""
+        x0, passo = grade
+        f = np.clip((x - x0) / passo, 0.0, matriz.shape[1] - 1.0)
+        i0 = np.minimum(f.astype(np.intp), matriz.shape[1] - 2)
+        t = f - i0.astype(f.dtype)  # subtrair o intp promoveria para float64
+        return matriz[:, i0] * (1.0 - t) + matriz[:, i0 + 1] * t
+
+    def simular_fast(self, anomalia_temp: float, deficit_hid: float, anomalia_ndvi: float) -> float:
+        """
+        Inferência sem o ``ControlSystemSimulation``: funções de pertinência e
+        as 47 regras especializadas no kernel em linha reta gerado por
+        ``_kernels.build_kernel`` (compilado com numba quando disponível),
+        defuzzificação pela média dos centroides ponderada pelos disparos
+        (center-average), y* = sum(w_l * y_l) / sum(w_l).
+        """
+        return float(self._kernel(
+            float(anomalia_temp), float(deficit_hid), float(anomalia_ndvi),
+            self._centroides_arr, _RISCO_PADRAO,
+        ))
+
+    def set_batch_size(self, n: int):
+        """
+        Pré-aloca os buffers de trabalho de ``simular_batch`` para blocos de
+        até ``n`` pontos; lotes maiores são processados em blocos desse
+        tamanho, reutilizando os mesmos buffers (sem malloc por chamada).
+        """
+        n_regras = len(self._regra_cons_idx)
+        n_cons = len(self._centroides)
+        self._scratch = {
+            'n': n,
+            'ga': np.empty((n_regras, n), dtype=np.float32),
+            'gb': np.empty((n_regras, n), dtype=np.float32),
+            'fogo': np.empty((n_regras, n), dtype=np.float32),
+            'ativ': np.empty((n_cons, n), dtype=np.float32),
+        }
+
+    def _lote_bloco(self, at, dh, nd, saida):
+        """Avalia um bloco que cabe nos buffers de trabalho, escrevendo em ``saida``."""
+        s = self._scratch
+        m = at.size
+        mu_n, mu_d, mu_a = (
+            self._interpolar_matriz(x, matriz, grade)
+            for x, matriz, grade in (
+                (nd, self._mf_nd_matriz, self._grade_nd),
+                (dh, self._mf_dh_matriz, self._grade_dh),
+                (at, self._mf_at_matriz, self._grade_at),
+            )
+        )
+
+        # Forças de disparo (47, m) por gather + minimum nos buffers fixos,
+        # agregadas por termo do consequente com um reduceat sobre os grupos
+        ga, gb, fogo = s['ga'][:, :m], s['gb'][:, :m], s['fogo'][:, :m]
+        np.take(mu_n, self._regra_n_idx, axis=0, out=ga)
+        np.take(mu_d, self._regra_d_idx, axis=0, out=gb)
+        np.minimum(ga, gb, out=fogo)
+        np.take(mu_a, self._regra_a_idx, axis=0, out=ga)
+        np.minimum(fogo, ga, out=fogo)
+        ativacao = np.maximum.reduceat(fogo, self._regra_grupos, axis=0,
+                                       out=s['ativ'][:, :m])
+
+        # Disparos da ordem do epsilon são ruído da amostragem das MFs, não
+        # ativação real: abaixo da tolerância vale o risco padrão (e dividir
+        # por eles causaria cancelamento catastrófico)
+        soma_w = ativacao.sum(axis=0)
+        disparou = soma_w > 1e-6
+        ponderado = np.tensordot(self._centroides_arr_f32, ativacao, axes=(0, 0))
+        saida[...] = np.where(disparou, ponderado / np.where(disparou, soma_w, 1.0),
+                              _RISCO_PADRAO)
+
+    def simular_batch(self, anomalia_temp, deficit_hid, anomalia_ndvi) -> np.ndarray:
+        """
+        Versão em lote de ``simular_fast`` para arrays de N pontos (pixels,
+        séries temporais): fuzzificação vetorizada, regras com
+        ``np.minimum``/``np.maximum`` em buffers pré-alocados e
+        defuzzificação center-average, tudo sem laço Python sobre os pontos.
+
+        Os buffers de trabalho são por instância (ver ``set_batch_size``);
+        para lotes concorrentes use uma instância por thread.
+        """
+        at = np.asarray(anomalia_temp, dtype=np.float32)
+        dh = np.asarray(deficit_hid, dtype=np.float32)
+        nd = np.asarray(anomalia_ndvi, dtype=np.float32)
+
+        saida = np.empty(at.shape, dtype=np.float32)
+        plano = saida.reshape(-1)
+        at_p, dh_p, nd_p = at.reshape(-1), dh.reshape(-1), nd.reshape(-1)
+
+        # Com numba, o kernel escalar paralelizado por prange domina o caminho
+        # NumPy: cada pixel é independente e cabe em registradores
+        if self._kernel_lote is not None:
+            self._kernel_lote(at_p, dh_p, nd_p, self._centroides_arr,
+                              _RISCO_PADRAO, plano)
+            return saida
+
+        if self._scratch is None:
+            self.set_batch_size(min(max(at.size, 1), self._TAM_BLOCO_PADRAO))
+        tam = self._scratch['n']
+        for ini in range(0, at_p.size, tam):
+            fim = min(ini + tam, at_p.size)
+            self._lote_bloco(at_p[ini:fim], dh_p[ini:fim], nd_p[ini:fim],
+                             plano[ini:fim])
+        return saida
+
+    def simular(self, anomalia_temp: float, deficit_hid: float, anomalia_ndvi: float,
+                use_lut: bool = True) -> float:
+        """
+        Calcula o risco de quebra de safra para um ponto.
+
+        Por padrão usa a tabela de consulta pré-computada com interpolação
+        trilinear (O(1) por chamada); ``use_lut=False`` mantém o caminho
+        original do scikit-fuzzy para validação.
+
+        Dentro da lacuna de cobertura da base de regras (onde o caminho de
+        referência nem sequer é definido) a LUT devolve o valor da célula
+        disparada mais próxima, não o risco padrão. Em regiões suaves o erro
+        da interpolação fica em centésimos de ponto, mas perto de feições da
+        largura da grade — a borda da lacuna em at≈7 e o triângulo estreito
+        de calor_moderado em at∈[1,3] — pode chegar a ~10 pontos; use
+        ``use_lut=False`` (ou ``simular_fast``) quando isso importar.
+        """
+        if not use_lut:
+            # Resolve o simulador da thread e o mapeamento de entrada uma vez
+            # por chamada, atribuindo pelas chaves internadas
+            sim = self.simulador
+            entrada = sim.input
+            entrada[self._k_at] = anomalia_temp
+            entrada[self._k_dh] = deficit_hid
+            entrada[self._k_nd] = anomalia_ndvi
+            sim.compute()
+            # Devolve o escalar numpy como está: já se comporta como float e
+            # a coerção só custaria mais uma chamada por ponto. (O dict de
+            # saída não pode ser cacheado: compute() o reatribui a cada rodada)
+            return sim.output[self._k_rq]
+
+        lut = self._obter_lut()
+
+        # Índices fracionários na grade (passos 1, 1 e 0.01)
+        fa = np.clip(anomalia_temp + 15.0, 0.0, lut.shape[0] - 1.0)
+        fd = np.clip(deficit_hid, 0.0, lut.shape[1] - 1.0)
+        fn = np.clip((anomalia_ndvi + 0.4) / 0.01, 0.0, lut.shape[2] - 1.0)
+        ia = min(int(fa), lut.shape[0] - 2)
+        id_ = min(int(fd), lut.shape[1] - 2)
+        in_ = min(int(fn), lut.shape[2] - 2)
+        ta, td, tn = fa - ia, fd - id_, fn - in_
+
+        # Interpolação trilinear sobre as 8 células vizinhas
+        bloco = lut[ia:ia + 2, id_:id_ + 2, in_:in_ + 2].astype(np.float64)
+        c = bloco[0] * (1 - ta) + bloco[1] * ta
+        c = c[0] * (1 - td) + c[1] * td
+        return float(c[0] * (1 - tn) + c[1] * tn)
+
+    def categorizar(self, risco):
+        """
+        Categoriza o risco; aceita escalar (devolve o rótulo) ou ndarray
+        (devolve um array de rótulos), sem laço Python nem branches.
+        """
+        return _CATEGORIAS[np.searchsorted(_LIMIARES_CATEGORIA, risco, side='right')]
 
 
 def main():
@@ -0,0 +1,8 @@
+import pytest
+
+from projeto_fuzzy.fuzzy_system import AgroRiskFuzzy
+
+
+@pytest.fixture(scope="session")
+def sistema():
+    return AgroRiskFuzzy()